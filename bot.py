@@ -2,9 +2,15 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
-from config import DISCORD_TOKEN, DATABASE_PATH
+import os
+import threading
+import time
+from config import (DISCORD_TOKEN, DATABASE_PATH, LOOP_WATCHDOG_THRESHOLD_MS, PROFILE_OUTPUT_DIR,
+                    DB_MAINTENANCE_INTERVAL, DB_MAINTENANCE_IDLE_SECONDS)
 from database import Database
 from http_client import HTTPClient
+from metrics import metrics
+from profiler import LoopWatchdog, sample_profile, write_collapsed, top_frames
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -13,6 +19,7 @@ intents.members = True
 bot = commands.Bot(command_prefix='!', intents=intents)
 db = Database(DATABASE_PATH)
 http_client = HTTPClient()
+loop_watchdog = LoopWatchdog(LOOP_WATCHDOG_THRESHOLD_MS / 1000)
 
 def is_admin():
     async def predicate(ctx):
@@ -23,10 +30,36 @@ def is_admin():
         return False
     return commands.check(predicate)
 
+def record_command_timer(ctx, outcome: str):
+    start = getattr(ctx, 'command_start', None)
+    if ctx.command is None or start is None:
+        return
+    metrics.observe('ampbot_prefix_command_seconds', time.perf_counter() - start,
+                    command=ctx.command.qualified_name, outcome=outcome)
+
+@bot.event
+async def on_command_completion(ctx):
+    record_command_timer(ctx, 'ok')
+
+@bot.event
+async def on_command_error(ctx, error):
+    record_command_timer(ctx, 'error')
+    await commands.Bot.on_command_error(bot, ctx, error)
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} has logged in!')
+    # Registered here with the running loop: interaction_handler re-imports this file as `bot`,
+    # and an import-time registration would rebind the gauge to that copy's never-started bot
+    loop = asyncio.get_running_loop()
+    metrics.register_gauge('ampbot_event_loop_tasks', lambda: len(asyncio.all_tasks(loop)),
+                           'Pending tasks on the bot event loop')
+    if LOOP_WATCHDOG_THRESHOLD_MS > 0 and not loop_watchdog.running:
+        loop_watchdog.start(asyncio.get_running_loop())
+        print(f'Event loop watchdog started (threshold {LOOP_WATCHDOG_THRESHOLD_MS:.0f}ms)')
     await db.init_db()
+    if DB_MAINTENANCE_INTERVAL > 0:
+        db.start_maintenance(DB_MAINTENANCE_INTERVAL, DB_MAINTENANCE_IDLE_SECONDS)
     await db.add_history(f"Bot started and logged in as {bot.user}", None)
     
     try:
@@ -46,7 +79,14 @@ async def on_message(message):
         await db.add_user(message.author.id, 'user')
         await db.add_history(f"New user registered: {message.author.id} ({message.author})", message.author.id)
     
-    await bot.process_commands(message)
+    if message.author.bot:
+        return
+    
+    # Timed from here rather than before_invoke so checks and argument converters are included
+    command_start = time.perf_counter()
+    ctx = await bot.get_context(message)
+    ctx.command_start = command_start
+    await bot.invoke(ctx)
 
 @bot.command(name='ping')
 async def ping(ctx):
@@ -170,7 +210,10 @@ async def history(ctx, *, args: str = None):
             if part.startswith('<@') and part.endswith('>'):
                 try:
                     user_id = int(part[2:-1].replace('!', ''))
-                    user = await bot.fetch_user(user_id)
+                    user = bot.get_user(user_id)
+                    metrics.record_cache('user', user is not None)
+                    if user is None:
+                        user = await bot.fetch_user(user_id)
                 except:
                     pass
             elif part.isdigit():
@@ -194,15 +237,16 @@ async def history(ctx, *, args: str = None):
 async def history_slash(interaction: discord.Interaction, 
                        user: discord.User = None, 
                        limit: app_commands.Range[int, 1, 100] = 20):
-    embed, history_entries = await get_history_embed(user, limit)
-    
-    if embed:
-        await interaction.response.send_message(embed=embed)
-    else:
-        if user:
-            await interaction.response.send_message(f"No history entries found for {user.mention}", ephemeral=True)
+    with metrics.timer('ampbot_slash_command_seconds', command='history'):
+        embed, history_entries = await get_history_embed(user, limit)
+        
+        if embed:
+            await interaction.response.send_message(embed=embed)
         else:
-            await interaction.response.send_message("No history entries found", ephemeral=True)
+            if user:
+                await interaction.response.send_message(f"No history entries found for {user.mention}", ephemeral=True)
+            else:
+                await interaction.response.send_message("No history entries found", ephemeral=True)
 
 @bot.command(name='httpget')
 async def httpget(ctx, url: str):
@@ -247,6 +291,83 @@ async def httppost(ctx, url: str, *, json_data: str = None):
         await ctx.send(f"Error: {str(e)}")
         await db.add_history(f"HTTP POST error: {str(e)}", ctx.author.id)
 
+@bot.command(name='metrics')
+@is_admin()
+async def metrics_summary(ctx, top: int = 10):
+    top = max(1, min(top, 25))
+    series = []
+    for name, histograms in metrics.snapshot().items():
+        family = name[len('ampbot_'):-len('_seconds')]
+        for labels, histogram in histograms.items():
+            label_map = dict(labels)
+            target = label_map.get('command') or label_map.get('method') or label_map.get('step') or '?'
+            series.append((family, target, label_map.get('outcome'), histogram))
+    
+    if not series:
+        await ctx.send("No metrics recorded yet")
+        return
+    
+    series.sort(key=lambda item: item[3].sum, reverse=True)
+    embed = discord.Embed(title=f"Metrics (top {min(top, len(series))} by total time)", color=discord.Color.teal())
+    lines = []
+    for family, target, outcome, histogram in series[:top]:
+        avg_ms = histogram.sum / histogram.count * 1000
+        lines.append(f"`{family}` **{target}**{' (error)' if outcome == 'error' else ''}: "
+                     f"n={histogram.count} avg={avg_ms:.1f}ms "
+                     f"p50≤{histogram.quantile(0.5) * 1000:g}ms p99≤{histogram.quantile(0.99) * 1000:g}ms")
+    description = "\n".join(lines)
+    if len(description) > 4096:
+        description = description[:4093] + "..."
+    embed.description = description
+    
+    for cache, stats in metrics.cache_hit_rates().items():
+        embed.add_field(name=f"Cache: {cache}", value=f"{stats['rate']:.1%} hit ({stats['hit']}/{stats['hit'] + stats['miss']})", inline=True)
+    
+    try:
+        embed.add_field(name="Loop tasks", value=len(asyncio.all_tasks()), inline=True)
+    except RuntimeError:
+        pass
+    await ctx.send(embed=embed)
+
+@bot.command(name='profile')
+@is_admin()
+async def profile(ctx, seconds: float = 10.0, scope: str = 'all'):
+    seconds = max(1.0, min(seconds, 60.0))
+    thread_id = threading.get_ident() if scope == 'loop' else None
+    
+    await ctx.send(f"Sampling {'event loop thread' if thread_id else 'all threads'} for {seconds:g}s...")
+    stacks, samples = await asyncio.to_thread(sample_profile, seconds, 0.005, thread_id)
+    
+    output_path = os.path.join(PROFILE_OUTPUT_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    await asyncio.to_thread(write_collapsed, stacks, output_path)
+    await db.add_history(f"Profile captured: {output_path} ({samples} samples)", ctx.author.id)
+    
+    total = sum(stacks.values()) or 1
+    lines = [f"`{count / total:6.1%}` {frame}" for frame, count in top_frames(stacks)]
+    embed = discord.Embed(title=f"Profile ({samples} samples over {seconds:g}s)", color=discord.Color.dark_gold())
+    embed.description = "\n".join(lines) or "No samples collected"
+    embed.add_field(name="Collapsed stacks", value=f"`{output_path}`", inline=False)
+    if loop_watchdog.running:
+        embed.add_field(name="Max loop lag", value=f"{loop_watchdog.max_lag * 1000:.0f}ms", inline=True)
+    await ctx.send(embed=embed, file=discord.File(output_path))
+
+@bot.command(name='dbmaintenance')
+@is_admin()
+async def dbmaintenance(ctx):
+    await ctx.send("Running database maintenance...")
+    report = await db.run_maintenance(time_budget=2.0, integrity_check=True)
+    
+    embed = discord.Embed(title="Database Maintenance", color=discord.Color.dark_green())
+    for step in report:
+        detail = step['detail']
+        if len(detail) > 900:
+            detail = detail[:897] + "..."
+        embed.add_field(name=step['step'],
+                        value=f"{step['duration'] * 1000:.1f}ms, {step['bytes_reclaimed']} bytes reclaimed\n{detail}",
+                        inline=False)
+    await ctx.send(embed=embed)
+    await db.add_history("Database maintenance run manually", ctx.author.id)
+
 @bot.command(name='help_custom')
 async def help_custom(ctx):
     embed = discord.Embed(title="Bot Commands", color=discord.Color.orange())
@@ -259,6 +380,9 @@ async def help_custom(ctx):
     embed.add_field(name="!history [user] [limit]", value="View bot history, optionally filtered by user (max 100)", inline=False)
     embed.add_field(name="!httpget <url>", value="Make an HTTP GET request", inline=False)
     embed.add_field(name="!httppost <url> [json]", value="Make an HTTP POST request", inline=False)
+    embed.add_field(name="!metrics [top]", value="Show command, database and HTTP latency summary (admin only)", inline=False)
+    embed.add_field(name="!profile [seconds] [all|loop]", value="Capture a sampling profile as collapsed stacks (admin only)", inline=False)
+    embed.add_field(name="!dbmaintenance", value="Optimize, vacuum and run a full integrity check on the database (admin only)", inline=False)
     await ctx.send(embed=embed)
 
 def run_interaction_server():
@@ -272,8 +396,6 @@ def run_interaction_server():
     app.run(host='0.0.0.0', port=INTERACTION_ENDPOINT_PORT, debug=False, use_reloader=False)
 
 if __name__ == '__main__':
-    import threading
-    
     if not DISCORD_TOKEN:
         print("Error: DISCORD_TOKEN not found in environment variables!")
     else:
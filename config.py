@@ -8,3 +8,8 @@ DATABASE_PATH = os.getenv('DATABASE_PATH', 'bot_database.db')
 CLIENT_ID = os.getenv('CLIENT_ID')
 PUBLIC_KEY = os.getenv('PUBLIC_KEY')
 INTERACTION_ENDPOINT_PORT = int(os.getenv('INTERACTION_ENDPOINT_PORT', '8000'))
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.getenv('LOOP_WATCHDOG_THRESHOLD_MS', '0'))
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', 'profiles')
+DB_MAINTENANCE_INTERVAL = float(os.getenv('DB_MAINTENANCE_INTERVAL', '3600'))
+DB_MAINTENANCE_IDLE_SECONDS = float(os.getenv('DB_MAINTENANCE_IDLE_SECONDS', '300'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
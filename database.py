@@ -1,15 +1,51 @@
 import sqlite3
 import aiosqlite
+import asyncio
 import json
+import os
+import time
 from typing import Optional, List, Dict, Any
+from metrics import metrics
+
+metrics.describe('ampbot_db_maintenance_seconds', 'Duration of database maintenance steps')
+metrics.describe('ampbot_db_maintenance_reclaimed_bytes_total', 'Bytes reclaimed from the database and WAL files')
+
+# Keyed by database file rather than stored per instance: bot.py is imported twice (as __main__ and
+# by interaction_handler as `bot`), so HTTP interactions query through a different Database object
+_last_activity: Dict[str, float] = {}
 
 class Database:
     def __init__(self, db_path: str = 'bot_database.db'):
         self.db_path = db_path
         self.max_history_entries = 1000
+        _last_activity.setdefault(os.path.abspath(db_path), time.monotonic())
+        self.last_maintenance = time.monotonic()
+        self.last_integrity_check = 0.0
+        self.last_maintenance_report: List[Dict[str, Any]] = []
+        self.integrity_check_interval = 24 * 3600
+        self.vacuum_pages_per_step = 64
+        self.analyze_min_row_change = 100
+        self.analyze_row_change_ratio = 0.25
+        self._maintenance_task = None
+        self._maintenance_lock = asyncio.Lock()
+    
+    @property
+    def last_activity(self) -> float:
+        return _last_activity[os.path.abspath(self.db_path)]
     
+    def _connect(self):
+        _last_activity[os.path.abspath(self.db_path)] = time.monotonic()
+        return aiosqlite.connect(self.db_path)
+    
+    @metrics.timed('ampbot_db_query_seconds')
     async def init_db(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
+            async with db.execute('PRAGMA auto_vacuum') as cursor:
+                auto_vacuum = (await cursor.fetchone())[0]
+            if auto_vacuum != 2:
+                await db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                await db.execute('VACUUM')
+            
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -50,19 +86,21 @@ class Database:
             
             await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def add_user(self, user_id: int, role: str = 'user'):
         if role not in ('user', 'admin'):
             raise ValueError("Role must be 'user' or 'admin'")
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO users (user_id, role)
                 VALUES (?, ?)
             ''', (user_id, role))
             await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute('''
                 SELECT user_id, role FROM users WHERE user_id = ?
             ''', (user_id,)) as cursor:
@@ -74,24 +112,27 @@ class Database:
                     }
                 return None
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def update_user_role(self, user_id: int, role: str):
         if role not in ('user', 'admin'):
             raise ValueError("Role must be 'user' or 'admin'")
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('''
                 UPDATE users SET role = ? WHERE user_id = ?
             ''', (role, user_id))
             await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_all_users(self) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute('''
                 SELECT user_id, role FROM users
             ''') as cursor:
                 rows = await cursor.fetchall()
                 return [{'user_id': row[0], 'role': row[1]} for row in rows]
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def set_instance_permission(self, user_id: int, instance_id: str,
                                      start_permission: bool = False,
                                      stop_permission: bool = False,
@@ -99,7 +140,7 @@ class Database:
                                      additional_permissions: Optional[Dict[str, Any]] = None):
         additional_perms_json = json.dumps(additional_permissions or {})
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO instance_permissions 
                 (user_id, instance_id, start_permission, stop_permission, status_permission, additional_permissions)
@@ -108,8 +149,9 @@ class Database:
                   int(status_permission), additional_perms_json))
             await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_instance_permission(self, user_id: int, instance_id: str) -> Optional[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute('''
                 SELECT user_id, instance_id, start_permission, stop_permission, 
                        status_permission, additional_permissions
@@ -128,8 +170,9 @@ class Database:
                     }
                 return None
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_user_instance_permissions(self, user_id: int) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute('''
                 SELECT user_id, instance_id, start_permission, stop_permission, 
                        status_permission, additional_permissions
@@ -146,8 +189,9 @@ class Database:
                     'additional_permissions': json.loads(row[5] or '{}')
                 } for row in rows]
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_instance_permissions(self, instance_id: str) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute('''
                 SELECT user_id, instance_id, start_permission, stop_permission, 
                        status_permission, additional_permissions
@@ -164,8 +208,9 @@ class Database:
                     'additional_permissions': json.loads(row[5] or '{}')
                 } for row in rows]
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def delete_instance_permission(self, user_id: int, instance_id: str):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('''
                 DELETE FROM instance_permissions 
                 WHERE user_id = ? AND instance_id = ?
@@ -181,16 +226,19 @@ class Database:
         additional_perms = perm['additional_permissions']
         additional_perms[permission_key] = permission_value
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                UPDATE instance_permissions 
-                SET additional_permissions = ?
-                WHERE user_id = ? AND instance_id = ?
-            ''', (json.dumps(additional_perms), user_id, instance_id))
-            await db.commit()
+        # Only the UPDATE is timed here; get_instance_permission records its own query
+        with metrics.timer('ampbot_db_query_seconds', method='update_additional_permission'):
+            async with self._connect() as db:
+                await db.execute('''
+                    UPDATE instance_permissions 
+                    SET additional_permissions = ?
+                    WHERE user_id = ? AND instance_id = ?
+                ''', (json.dumps(additional_perms), user_id, instance_id))
+                await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def add_history(self, log: str, user_id: Optional[int] = None):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT INTO history (log, user_id) VALUES (?, ?)
             ''', (log, user_id))
@@ -210,8 +258,9 @@ class Database:
             
             await db.commit()
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def get_history(self, limit: int = 100, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             if user_id is not None:
                 async with db.execute('''
                     SELECT id, timestamp, log, user_id 
@@ -242,7 +291,135 @@ class Database:
                         'user_id': row[3]
                     } for row in rows]
     
+    @metrics.timed('ampbot_db_query_seconds')
     async def clear_history(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute('DELETE FROM history')
             await db.commit()
+    
+    def _file_size(self) -> int:
+        size = 0
+        for path in (self.db_path, self.db_path + '-wal'):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+    
+    async def _maintenance_step(self, report: List[Dict[str, Any]], step: str, func):
+        size_before = self._file_size()
+        start = time.perf_counter()
+        detail = await func()
+        duration = time.perf_counter() - start
+        reclaimed = max(0, size_before - self._file_size())
+        
+        metrics.observe('ampbot_db_maintenance_seconds', duration, step=step)
+        metrics.inc('ampbot_db_maintenance_reclaimed_bytes_total', reclaimed, step=step)
+        print(f"DB maintenance: {step} took {duration * 1000:.1f}ms, reclaimed {reclaimed} bytes ({detail})")
+        report.append({'step': step, 'duration': duration, 'bytes_reclaimed': reclaimed, 'detail': detail})
+    
+    async def run_maintenance(self, time_budget: float = 0.5, integrity_check: bool = False) -> List[Dict[str, Any]]:
+        report: List[Dict[str, Any]] = []
+        
+        async with self._maintenance_lock, aiosqlite.connect(self.db_path) as db:
+            async def checkpoint():
+                async with db.execute('PRAGMA wal_checkpoint(TRUNCATE)') as cursor:
+                    busy, log_pages, checkpointed = await cursor.fetchone()
+                return f'busy={busy}, log_pages={log_pages}, checkpointed={checkpointed}'
+            
+            async def optimize():
+                # PRAGMA optimize before SQLite 3.46 only considers tables this connection has
+                # queried, so row counts are compared against sqlite_stat1 to decide on ANALYZE
+                async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'") as cursor:
+                    has_stats = await cursor.fetchone() is not None
+                stale_tables = []
+                if has_stats:
+                    async with db.execute('''
+                        SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl
+                    ''') as cursor:
+                        analyzed_rows = {row[0]: row[1] for row in await cursor.fetchall()}
+                    async with db.execute('''
+                        SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+                    ''') as cursor:
+                        tables = [row[0] for row in await cursor.fetchall()]
+                    for table in tables:
+                        async with db.execute(f'SELECT COUNT(*) FROM "{table}"') as cursor:
+                            rows = (await cursor.fetchone())[0]
+                        analyzed = analyzed_rows.get(table, 0)
+                        if abs(rows - analyzed) > max(self.analyze_min_row_change, analyzed * self.analyze_row_change_ratio):
+                            stale_tables.append(table)
+                
+                if not has_stats or stale_tables:
+                    await db.execute('ANALYZE')
+                await db.execute('PRAGMA optimize=0x10002')
+                await db.commit()
+                if not has_stats:
+                    return 'analyze (no statistics) + optimize'
+                if stale_tables:
+                    return f"analyze (stale: {', '.join(stale_tables)}) + optimize"
+                return 'optimize'
+            
+            async def incremental_vacuum():
+                deadline = time.perf_counter() + time_budget
+                initial_pages = None
+                while True:
+                    async with db.execute('PRAGMA freelist_count') as cursor:
+                        free_pages = (await cursor.fetchone())[0]
+                    if initial_pages is None:
+                        initial_pages = free_pages
+                    if not free_pages or time.perf_counter() >= deadline:
+                        break
+                    # execute() only steps the pragma once (one page); executescript runs it to completion
+                    await db.executescript(f'PRAGMA incremental_vacuum({self.vacuum_pages_per_step})')
+                return f'pages_freed={initial_pages - free_pages}, pages_remaining={free_pages}'
+            
+            async def check_integrity(pragma: str):
+                async with db.execute(f'PRAGMA {pragma}') as cursor:
+                    rows = await cursor.fetchall()
+                result = ', '.join(row[0] for row in rows)
+                if result != 'ok':
+                    print(f"DB maintenance: {pragma} failed: {result}")
+                return result
+            
+            async with db.execute('PRAGMA journal_mode') as cursor:
+                journal_mode = (await cursor.fetchone())[0]
+            if journal_mode == 'wal':
+                await self._maintenance_step(report, 'checkpoint', checkpoint)
+            await self._maintenance_step(report, 'optimize', optimize)
+            await self._maintenance_step(report, 'incremental_vacuum', incremental_vacuum)
+            
+            now = time.monotonic()
+            if integrity_check:
+                # Full check on request: unlike quick_check it also verifies indexes match their tables
+                await self._maintenance_step(report, 'integrity_check', lambda: check_integrity('integrity_check'))
+                self.last_integrity_check = now
+            elif now - self.last_integrity_check >= self.integrity_check_interval:
+                await self._maintenance_step(report, 'quick_check', lambda: check_integrity('quick_check'))
+                self.last_integrity_check = now
+        
+        self.last_maintenance = time.monotonic()
+        self.last_maintenance_report = report
+        return report
+    
+    async def _maintenance_loop(self, interval: float, idle_seconds: float, poll_interval: float):
+        while True:
+            await asyncio.sleep(poll_interval)
+            now = time.monotonic()
+            due = now - self.last_maintenance >= interval
+            idle = now - self.last_activity >= idle_seconds and self.last_activity > self.last_maintenance
+            if not (due or idle):
+                continue
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                print(f"DB maintenance failed: {e}")
+    
+    def start_maintenance(self, interval: float = 3600, idle_seconds: float = 300, poll_interval: float = 30):
+        if self._maintenance_task and not self._maintenance_task.done():
+            return
+        self._maintenance_task = asyncio.get_running_loop().create_task(
+            self._maintenance_loop(interval, idle_seconds, poll_interval)
+        )
+    
+    def stop_maintenance(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
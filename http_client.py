@@ -1,9 +1,11 @@
 import aiohttp
 import requests
 from typing import Optional, Dict, Any
+from metrics import metrics
 
 class HTTPClient:
     @staticmethod
+    @metrics.timed('ampbot_http_request_seconds')
     async def get_async(url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         async with aiohttp.ClientSession() as session:
             async with session.get(url, headers=headers) as response:
@@ -14,6 +16,7 @@ class HTTPClient:
                 }
     
     @staticmethod
+    @metrics.timed('ampbot_http_request_seconds')
     async def post_async(url: str, data: Optional[Dict[str, Any]] = None, 
                         json: Optional[Dict[str, Any]] = None, 
                         headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
@@ -26,6 +29,7 @@ class HTTPClient:
                 }
     
     @staticmethod
+    @metrics.timed('ampbot_http_request_seconds')
     def get_sync(url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         response = requests.get(url, headers=headers)
         return {
@@ -35,6 +39,7 @@ class HTTPClient:
         }
     
     @staticmethod
+    @metrics.timed('ampbot_http_request_seconds')
     def post_sync(url: str, data: Optional[Dict[str, Any]] = None,
                  json: Optional[Dict[str, Any]] = None,
                  headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
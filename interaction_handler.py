@@ -1,14 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from nacl.signing import VerifyKey
 from nacl.exceptions import BadSignatureError
 import json
 import asyncio
-from config import PUBLIC_KEY, CLIENT_ID
+import hmac
+import threading
+import time
+from config import PUBLIC_KEY, CLIENT_ID, METRICS_TOKEN
 from database import Database
+from metrics import metrics
 
 app = Flask(__name__)
 db_instance = None
 bot_instance = None
+interactions_in_flight = 0
+in_flight_lock = threading.Lock()
+
+metrics.register_gauge('ampbot_interactions_in_flight', lambda: interactions_in_flight,
+                       'HTTP interactions currently being handled')
 
 def set_db_instance(db):
     global db_instance
@@ -19,19 +28,43 @@ def set_bot_instance(bot):
     bot_instance = bot_instance or bot
 
 def verify_signature(request_body: bytes, signature: str, timestamp: str) -> bool:
-    if not PUBLIC_KEY:
+    if not PUBLIC_KEY or not signature or not timestamp:
         return False
     
     try:
         verify_key = VerifyKey(bytes.fromhex(PUBLIC_KEY))
         verify_key.verify(
-            f'{timestamp}{request_body}'.encode(),
+            timestamp.encode() + request_body,
             bytes.fromhex(signature)
         )
         return True
-    except BadSignatureError:
+    except (BadSignatureError, ValueError):
         return False
 
+@app.before_request
+def start_request_timer():
+    global interactions_in_flight
+    g.request_start = time.perf_counter()
+    if request.endpoint == 'handle_interaction':
+        with in_flight_lock:
+            interactions_in_flight += 1
+
+@app.teardown_request
+def record_request_timer(error=None):
+    global interactions_in_flight
+    if request.endpoint != 'handle_interaction' or 'request_start' not in g:
+        return
+    with in_flight_lock:
+        interactions_in_flight -= 1
+    metrics.observe('ampbot_interaction_seconds', time.perf_counter() - g.request_start,
+                    command=g.get('interaction_command', 'unknown'),
+                    outcome='error' if error or g.get('interaction_status', 500) >= 400 else 'ok')
+
+@app.after_request
+def store_response_status(response):
+    g.interaction_status = response.status_code
+    return response
+
 @app.route('/interactions', methods=['POST'])
 def handle_interaction():
     signature = request.headers.get('X-Signature-Ed25519')
@@ -44,10 +77,12 @@ def handle_interaction():
     interaction_data = json.loads(request_body)
     
     if interaction_data['type'] == 1:
+        g.interaction_command = 'ping'
         return jsonify({'type': 1})
     
     if interaction_data['type'] == 2:
         command_name = interaction_data['data']['name']
+        g.interaction_command = command_name
         user_id = int(interaction_data['member']['user']['id']) if 'member' in interaction_data else int(interaction_data['user']['id'])
         
         if command_name == 'history':
@@ -63,7 +98,10 @@ def handle_interaction():
                 user = None
                 if user_id_filter and bot_instance:
                     try:
-                        user_obj = loop.run_until_complete(bot_instance.fetch_user(user_id_filter))
+                        user_obj = bot_instance.get_user(int(user_id_filter))
+                        metrics.record_cache('user', user_obj is not None)
+                        if user_obj is None:
+                            user_obj = loop.run_until_complete(bot_instance.fetch_user(user_id_filter))
                         user = user_obj
                     except:
                         pass
@@ -108,3 +146,12 @@ def handle_interaction():
 def health_check():
     return jsonify({'status': 'ok'})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Served on the public interactions port, so it stays disabled unless a bearer token is configured
+    if not METRICS_TOKEN:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
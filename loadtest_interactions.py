@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import bisect
+import json
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import time
+from typing import Optional, List, Dict, Any
+
+import aiohttp
+from nacl.signing import SigningKey
+
+DEADLINE_SECONDS = 3.0
+BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 3000, 5000, 10000]
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.samples: List[float] = []
+        self.errors = 0
+        self.deadline_misses = 0
+
+    def record(self, latency: float, ok: bool):
+        latency_ms = latency * 1000
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, latency_ms)] += 1
+        self.samples.append(latency_ms)
+        if not ok:
+            self.errors += 1
+        if latency > DEADLINE_SECONDS:
+            self.deadline_misses += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def report(self, name: str, elapsed: float):
+        total = len(self.samples)
+        print(f"== {name}: {total} requests in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+        if not total:
+            return
+        print(f"   p50={self.percentile(50):.1f}ms p90={self.percentile(90):.1f}ms "
+              f"p99={self.percentile(99):.1f}ms max={max(self.samples):.1f}ms")
+        print(f"   errors={self.errors} ({self.errors / total:.2%}) "
+              f"deadline misses (>{DEADLINE_SECONDS:.0f}s)={self.deadline_misses} ({self.deadline_misses / total:.2%})")
+        lower = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS + [None], self.counts):
+            label = f"{lower}-{bound}ms" if bound is not None else f">{lower}ms"
+            if count:
+                print(f"   {label:>14} {count:>7} {'#' * max(1, int(40 * count / total))}")
+            lower = bound
+
+class StubUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"loadtest-{user_id}"
+
+class StubBot:
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        return StubUser(int(user_id))
+
+def build_ping() -> Dict[str, Any]:
+    return {'type': 1}
+
+def build_history(user_id: int, limit: int, filter_user: Optional[int] = None) -> Dict[str, Any]:
+    options = [{'name': 'limit', 'type': 4, 'value': limit}]
+    if filter_user is not None:
+        options.append({'name': 'user', 'type': 6, 'value': str(filter_user)})
+    return {
+        'type': 2,
+        'data': {'name': 'history', 'options': options},
+        'user': {'id': str(user_id)}
+    }
+
+def sign_payload(signing_key: SigningKey, payload: Dict[str, Any]):
+    body = json.dumps(payload).encode()
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    return body, {
+        'Content-Type': 'application/json',
+        'X-Signature-Ed25519': signature,
+        'X-Signature-Timestamp': timestamp
+    }
+
+def serve_local(public_key: str, seed_entries: int, port_queue):
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='ampbot-loadtest-'), 'loadtest.db')
+
+    import bot
+    import interaction_handler
+    from werkzeug.serving import make_server
+
+    async def seed():
+        await bot.db.init_db()
+        for i in range(seed_entries):
+            await bot.db.add_history(f"Load test seed entry {i}", 1000 + i % 10)
+
+    asyncio.run(seed())
+
+    interaction_handler.PUBLIC_KEY = public_key
+    interaction_handler.set_db_instance(bot.db)
+    interaction_handler.set_bot_instance(StubBot())
+
+    server = make_server('127.0.0.1', 0, interaction_handler.app, threaded=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+def start_local_server(signing_key: SigningKey, seed_entries: int):
+    # Separate process so the server does not share the load generator's GIL and skew its latencies
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    process = context.Process(target=serve_local, daemon=True,
+                              args=(signing_key.verify_key.encode().hex(), seed_entries, port_queue))
+    process.start()
+    try:
+        port = port_queue.get(timeout=60)
+    except queue.Empty:
+        process.terminate()
+        raise RuntimeError("Local interaction server did not start within 60s")
+    return process, f"http://127.0.0.1:{port}/interactions"
+
+async def run_load(url: str, signing_key: SigningKey, total: int, concurrency: int,
+                   rate: float, history_ratio: float, filter_ratio: float):
+    histograms = {'ping': LatencyHistogram(), 'history': LatencyHistogram()}
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=max(10.0, DEADLINE_SECONDS * 3))
+
+    async def fire(session, kind, payload, intended_start):
+        try:
+            body, headers = sign_payload(signing_key, payload)
+            async with session.post(url, data=body, headers=headers) as response:
+                await response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        finally:
+            semaphore.release()
+        # Measured from the intended send time so a backed-up server is not hidden by the pacer waiting on it
+        histograms[kind].record(time.perf_counter() - intended_start, ok)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            intended_start = started + i / rate if rate > 0 else time.perf_counter()
+            delay = intended_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await semaphore.acquire()
+            if rate <= 0:
+                intended_start = time.perf_counter()
+
+            if random.random() < history_ratio:
+                filter_user = 1000 + random.randrange(10) if random.random() < filter_ratio else None
+                kind, payload = 'history', build_history(random.randrange(1, 1 << 60), random.randint(1, 100), filter_user)
+            else:
+                kind, payload = 'ping', build_ping()
+            tasks.append(asyncio.create_task(fire(session, kind, payload, intended_start)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    combined = LatencyHistogram()
+    for name, histogram in histograms.items():
+        histogram.report(name, elapsed)
+        for sample in histogram.samples:
+            combined.record(sample / 1000, True)
+        combined.errors += histogram.errors
+    combined.report('total', elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description='Signed load generator for the /interactions endpoint')
+    parser.add_argument('--requests', type=int, default=1000, help='Total number of interactions to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='Maximum in-flight requests')
+    parser.add_argument('--rate', type=float, default=0, help='Target requests per second (0 = as fast as possible)')
+    parser.add_argument('--history-ratio', type=float, default=0.5, help='Fraction of type 2 history interactions')
+    parser.add_argument('--filter-ratio', type=float, default=0.2, help='Fraction of history interactions with a user filter')
+    parser.add_argument('--seed-entries', type=int, default=200, help='History rows written to the local database')
+    parser.add_argument('--url', help='Target an already running endpoint instead of starting a local one')
+    parser.add_argument('--private-key', help='Hex Ed25519 seed to sign with (required with --url)')
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.private_key:
+            print("Error: --private-key is required when targeting --url")
+            return
+        signing_key = SigningKey(bytes.fromhex(args.private_key))
+        url = args.url
+        server = None
+    else:
+        signing_key = SigningKey.generate()
+        server, url = start_local_server(signing_key, args.seed_entries)
+
+    print(f"Public key: {signing_key.verify_key.encode().hex()}")
+    print(f"Driving {url} with {args.requests} requests, concurrency={args.concurrency}, rate={args.rate or 'unbounded'}")
+
+    try:
+        asyncio.run(run_load(url, signing_key, args.requests, args.concurrency, args.rate,
+                             args.history_ratio, args.filter_ratio))
+    finally:
+        if server:
+            server.terminate()
+            server.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(DEFAULT_BUCKETS)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def register_gauge(self, name: str, func: Callable[[], float], help_text: Optional[str] = None):
+        self._gauges[name] = func
+        if help_text:
+            self.describe(name, help_text)
+
+    def record_cache(self, cache: str, hit: bool):
+        self.inc('ampbot_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe(name, time.perf_counter() - start, outcome=outcome, **labels)
+
+    def timed(self, name: str, **labels):
+        def decorator(func):
+            label_values = dict(labels)
+            label_values.setdefault('method', func.__name__)
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **label_values):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **label_values):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Dict[LabelKey, Histogram]]:
+        with self._lock:
+            return {
+                name: {key: self._copy(h) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+    def cache_hit_rates(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            series = dict(self._counters.get('ampbot_cache_requests_total', {}))
+        rates: Dict[str, Dict[str, Any]] = {}
+        for key, value in series.items():
+            labels = dict(key)
+            entry = rates.setdefault(labels['cache'], {'hit': 0, 'miss': 0})
+            entry[labels['result']] += int(value)
+        for entry in rates.values():
+            total = entry['hit'] + entry['miss']
+            entry['rate'] = entry['hit'] / total if total else 0.0
+        return rates
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        histograms = self.snapshot()
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name in sorted(histograms):
+            self._header(lines, name, 'histogram')
+            for key, histogram in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + [float('inf')], histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{self._labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{self._labels(key)} {histogram.count}")
+
+        for name in sorted(counters):
+            self._header(lines, name, 'counter')
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{self._labels(key)} {value}")
+
+        for name in sorted(self._gauges):
+            try:
+                value = self._gauges[name]()
+            except Exception:
+                continue
+            self._header(lines, name, 'gauge')
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, metric_type: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+    @staticmethod
+    def _labels(key: LabelKey) -> str:
+        if not key:
+            return ''
+        escaped = ','.join(
+            f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for k, v in key
+        )
+        return '{' + escaped + '}'
+
+    @staticmethod
+    def _copy(histogram: Histogram) -> Histogram:
+        copy = Histogram(histogram.buckets)
+        copy.counts = list(histogram.counts)
+        copy.count = histogram.count
+        copy.sum = histogram.sum
+        return copy
+
+metrics = MetricsRegistry()
+
+metrics.describe('ampbot_prefix_command_seconds', 'Latency of prefix (!) commands')
+metrics.describe('ampbot_slash_command_seconds', 'Latency of gateway slash commands')
+metrics.describe('ampbot_interaction_seconds', 'Latency of HTTP /interactions requests')
+metrics.describe('ampbot_db_query_seconds', 'Latency of Database methods')
+metrics.describe('ampbot_http_request_seconds', 'Latency of HTTPClient calls')
+metrics.describe('ampbot_cache_requests_total', 'Cache lookups by cache and result')
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional, Dict, Tuple
+from metrics import metrics
+
+metrics.describe('ampbot_event_loop_lag_seconds', 'Delay between scheduled and actual event loop wakeups')
+metrics.describe('ampbot_event_loop_stalls_total', 'Callbacks that blocked the event loop past the watchdog threshold')
+
+class LoopWatchdog:
+    def __init__(self, threshold: float, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.next_beat = time.monotonic() + interval
+        self.max_lag = 0.0
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if self.running:
+            return
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.next_beat = time.monotonic() + self.interval
+        self._stop.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            self.next_beat = expected
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe('ampbot_event_loop_lag_seconds', lag)
+
+    def _watch(self):
+        reported_beat = None
+        poll_interval = min(self.interval, self.threshold / 2)
+        while not self._stop.wait(poll_interval):
+            # Lateness of the pending heartbeat, not time since the last one, so idle sleeps are not stalls
+            beat = self.next_beat
+            late_by = time.monotonic() - beat
+            if late_by < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            metrics.inc('ampbot_event_loop_stalls_total')
+            stack = ''.join(traceback.format_stack(frame))
+            print(f'Event loop heartbeat late by {late_by * 1000:.0f}ms (threshold {self.threshold * 1000:.0f}ms), '
+                  f'currently running:\n{stack}')
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def sample_profile(duration: float, interval: float = 0.005,
+                   thread_id: Optional[int] = None) -> Tuple[Counter, int]:
+    own_thread = threading.get_ident()
+    names: Dict[int, str] = {t.ident: t.name for t in threading.enumerate()}
+    stacks: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread or (thread_id is not None and ident != thread_id):
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame))
+                frame = frame.f_back
+            frames.append(names.get(ident, f'thread-{ident}'))
+            stacks[';'.join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return stacks, samples
+
+def write_collapsed(stacks: Counter, output_path: str):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+def top_frames(stacks: Counter, limit: int = 10) -> list:
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    return leaves.most_common(limit)